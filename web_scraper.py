@@ -1,15 +1,23 @@
+import argparse
+import atexit
+import json
 import gspread
 from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
 import re
 from typing import List, Dict, Optional, Set
+from urllib.parse import urlparse
 
 # Imports for homepage scraping
 import requests
-from bs4 import BeautifulSoup
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -25,13 +33,165 @@ from gspread_formatting import (
     ConditionalFormatRule,
     BooleanCondition,
     CellFormat,
-    Color
+    Color,
+    TextFormat,
+    format_cell_range
 )
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Compiled once: extracting the URL out of =HYPERLINK("...", "...") cells
+# happens inside per-row loops over the whole sheet.
+_HYPERLINK_RE = re.compile(r'=HYPERLINK\("([^"]+)"', re.IGNORECASE)
+
+def _col_letter(col_index: int) -> str:
+    """Return the A1 column letter for a 1-based column index."""
+    return rowcol_to_a1(1, col_index)[:-1]
+
+# Minimum gap (seconds) between two page loads against the same host
+PER_HOST_DELAY = 1.0
+
+# Invariant across runs; hoisted so repeated jobs don't re-read tzdata
+_IST_TZ = ZoneInfo("Asia/Kolkata")
+
+# Concurrent detail-page scrapes; each worker borrows a Chrome from the pool
+SCRAPE_WORKERS = 4
+
+# URLs that failed to scrape are skipped for this long (seconds) on later runs
+FAIL_CACHE_PATH = '.scrape_failures.json'
+FAIL_CACHE_TTL = 24 * 60 * 60
+
+# Sentinel returned by the fast path when the host rate-limited us: distinct
+# from None (attribute not found) so the caller knows not to pile a Selenium
+# load onto the same host.
+_RATE_LIMITED = object()
+
+_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+               '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+# The numeric unit input as it appears in server-rendered HTML, with either
+# attribute order; a hit here means no browser render is needed at all.
+# Bytes patterns so the raw body is searched without decoding it first —
+# the attribute values are plain ASCII on this site's template. Each
+# pattern anchors on a discriminating marker (the unit-selector-input
+# class or inputmode="numeric"), mirroring _MAX_INPUT_CSS: a bare
+# type="number" input would match unrelated quantity/filter widgets and
+# pre-empt the stricter Selenium fallback with a wrong value.
+# \s (not \b) before each attribute name: \b holds across a hyphen, so it
+# would let data-max/x-class style attributes impersonate the real ones.
+# The class token is likewise delimited by the quote or whitespace only.
+_FAST_MAX_PATTERNS = (
+    re.compile(rb'<input\b[^>]*?\sclass="(?:[^"]*\s)?unit-selector-input(?:\s[^"]*)?"[^>]*?\smax="(\d+)"',
+               re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<input\b[^>]*?\smax="(\d+)"[^>]*?\sclass="(?:[^"]*\s)?unit-selector-input(?:\s[^"]*)?"',
+               re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<input\b[^>]*?\sinputmode="numeric"[^>]*?\smax="(\d+)"',
+               re.IGNORECASE | re.DOTALL),
+    re.compile(rb'<input\b[^>]*?\smax="(\d+)"[^>]*?\sinputmode="numeric"',
+               re.IGNORECASE | re.DOTALL),
+)
+
+# All known shapes of the unit-count input, unioned so one DOM walk (and
+# one wait budget) covers every fallback.
+_MAX_INPUT_CSS = (
+    "input.unit-selector-input[type='number'], "
+    "aside input[type='number'], "
+    "input[type='number'][inputmode='numeric']"
+)
+
+# Chrome instances are expensive to start (~2s each), so keep released
+# drivers in a process-level pool and hand them back out on the next use.
+_DRIVER_POOL: List[webdriver.Chrome] = []
+_DRIVER_POOL_LOCK = threading.Lock()
+
+def _build_chrome_options(headless: bool = True) -> Options:
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+    chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument(f'--user-agent={_USER_AGENT}')
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    # Return from driver.get on DOMContentLoaded; the explicit waits handle
+    # anything that renders after that.
+    chrome_options.page_load_strategy = 'eager'
+    return chrome_options
+
+# Resource types the scraper never reads; blocking them cuts most of the
+# bytes (and decode time) of each bond page.
+_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg",
+    "*.woff*", "*.css", "*.mp4",
+    "*analytics*", "*gtag*",
+]
+
+def _launch_driver(headless: bool = True) -> webdriver.Chrome:
+    driver = webdriver.Chrome(options=_build_chrome_options(headless))
+    # Explicit waits only: an implicit wait would silently stack its timeout
+    # onto every WebDriverWait poll for elements that aren't there.
+    driver.implicitly_wait(0)
+    driver.set_page_load_timeout(10)
+    # Must exceed the in-page polling budget in scrape_max_value
+    driver.set_script_timeout(12)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": _BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        logger.warning(f"Could not enable CDP request blocking: {e}")
+    return driver
+
+def _acquire_driver(headless: bool = True) -> webdriver.Chrome:
+    """Hand out a pooled Chrome instance if a healthy one exists, else launch one."""
+    while True:
+        with _DRIVER_POOL_LOCK:
+            if not _DRIVER_POOL:
+                break
+            driver = _DRIVER_POOL.pop()
+        try:
+            driver.execute_script("return 1")  # health probe
+            return driver
+        except Exception:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+    return _launch_driver(headless)
+
+def _release_driver(driver):
+    """Return a driver to the pool, resetting session state for the next user."""
+    if driver is None:
+        return
+    try:
+        driver.delete_all_cookies()
+    except Exception:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        return
+    with _DRIVER_POOL_LOCK:
+        _DRIVER_POOL.append(driver)
+
+def _shutdown_driver_pool():
+    with _DRIVER_POOL_LOCK:
+        drivers, _DRIVER_POOL[:] = _DRIVER_POOL[:], []
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+atexit.register(_shutdown_driver_pool)
+
 class StablebondsScraper:
     def __init__(self, credentials_path: str, spreadsheet_url: str, headless: bool = True):
         self.credentials_path = credentials_path
@@ -39,9 +199,29 @@ class StablebondsScraper:
         self.headless = headless
         self.gc = None
         self.worksheet = None
-        self.driver = None
+        self._driver = None
+        self._next_ok: Dict[str, float] = {}
+        self._throttle_lock = threading.Lock()
+        # Per-run memo of scraped max values so duplicate URLs in the sheet
+        # cost one fetch; cleared at the start of each job.
+        self._max_cache: Dict[str, Optional[int]] = {}
+        self._max_cache_lock = threading.Lock()
+        # url -> last-failure epoch; persisted so dead links skip Selenium
+        # entirely until their TTL expires.
+        self._fail_cache: Dict[str, float] = self._load_fail_cache()
+        self._fail_cache_lock = threading.Lock()
+        # Pooled HTTP session for the static-HTML fast path
+        self.http = requests.Session()
+        self.http.headers.update({'User-Agent': _USER_AGENT})
+        # 429 deliberately absent from the forcelist: urllib3 would retry it
+        # internally (raising RetryError on exhaustion), so the response would
+        # never reach _fast_max_value's Retry-After handling.
+        http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                                   max_retries=Retry(total=3, backoff_factor=0.3,
+                                                     status_forcelist=[500, 502, 503, 504]))
+        self.http.mount('https://', http_adapter)
+        self.http.mount('http://', http_adapter)
         self.setup_google_sheets()
-        self.setup_selenium()
 
     def setup_google_sheets(self):
         """Setup Google Sheets connection"""
@@ -51,9 +231,17 @@ class StablebondsScraper:
                 'https://www.googleapis.com/auth/drive'
             ]
             creds = Credentials.from_service_account_file(self.credentials_path, scopes=scope)
-            self.gc = gspread.authorize(creds)
+            # One pooled, keep-alive session for every Sheets call so the many
+            # small API requests reuse a warm TLS connection instead of paying
+            # a TCP+TLS handshake each.
+            session = AuthorizedSession(creds)
+            session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=3))
+            self.gc = gspread.Client(auth=creds, session=session)
             self.worksheet = self.gc.open_by_url(self.spreadsheet_url).sheet1
-            logger.info("Google Sheets connection established successfully")
+            # Touch the worksheet metadata up front so later calls (and any raw
+            # batchUpdate payloads) don't trigger a lazy metadata fetch mid-job.
+            self._sheet_id = self.worksheet.id
+            logger.info(f"Google Sheets connection established successfully (sheet id {self._sheet_id})")
         except Exception as e:
             logger.error(f"Error setting up Google Sheets: {e}")
             raise
@@ -61,65 +249,105 @@ class StablebondsScraper:
     def setup_selenium(self):
         """Setup Selenium WebDriver"""
         try:
-            chrome_options = Options()
-            if self.headless:
-                chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.implicitly_wait(10)
+            self._driver = _acquire_driver(self.headless)
             logger.info("Selenium WebDriver setup successful")
         except Exception as e:
             logger.error(f"Error setting up Selenium: {e}")
             raise
 
-    def get_existing_bonds(self) -> tuple[Set[str], Set[str]]:
-        """Gets all existing bond names and URLs to prevent duplicates."""
+    @property
+    def driver(self):
+        """Lazily started WebDriver — Chrome only launches when a Selenium
+        path actually runs, so sheet-only work stays browser-free."""
+        if self._driver is None:
+            self.setup_selenium()
+        return self._driver
+
+    def _sheets_call(self, func, *args, **kwargs):
+        """Run a Sheets API call, retrying transient quota/server errors with
+        exponential backoff so a stray 429 doesn't discard a whole scrape."""
+        delay = 2
+        for attempt in range(6):
+            try:
+                return func(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status not in (429, 500, 503) or attempt == 5:
+                    raise
+                logger.warning(f"Sheets API returned {status}; retrying in {delay}s (attempt {attempt + 1}/5)")
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def fetch_snapshot(self) -> List[List[str]]:
+        """Fetch the whole sheet once (FORMULA rendering); every read in the
+        job is derived from this snapshot instead of issuing its own API call."""
+        logger.info("Fetching full sheet snapshot...")
+        return self._sheets_call(self.worksheet.get_all_values, value_render_option='FORMULA')
+
+    def _parse_snapshot(self, snapshot: List[List[str]]):
+        """Yields ``(row_num, name, url)`` for each non-empty data row of the
+        snapshot. Hot loop: regex and type checks are hoisted into locals and
+        each cell is touched exactly once."""
+        hyperlink_re = _HYPERLINK_RE
+        non_empty_b = 0
+        parsed = 0
+        for row_num, row in enumerate(snapshot[1:], 2):
+            if not row or not any(row):
+                continue
+
+            # str() cast: FORMULA rendering only affects formula cells — plain
+            # numeric cells still come back as int/float.
+            name = str(row[0]).strip() if row[0] else ""
+
+            # Formula cells in column B arrive as str; a cheap prefix check
+            # keeps the regex off plain-text cells, and the isinstance guard
+            # skips numeric cells, which can't hold a URL.
+            url = None
+            cell_content = row[1] if len(row) > 1 else ""
+            if cell_content and isinstance(cell_content, str) and cell_content.strip():
+                non_empty_b += 1
+                if cell_content.startswith('http'):
+                    url = cell_content
+                elif cell_content.startswith('='):
+                    match = hyperlink_re.search(cell_content)
+                    if match:
+                        url = match.group(1)
+                if url:
+                    parsed += 1
+
+            yield row_num, name, url
+
+        if parsed < non_empty_b:
+            logger.warning(f"Mismatch detected! Found {parsed} parseable URLs but {non_empty_b} non-empty cells in column B")
+
+    def scan_snapshot(self, snapshot: List[List[str]]) -> tuple[Set[str], Set[str], List[Dict[str, any]]]:
+        """One pass over the snapshot producing both the dedup sets (Part 1)
+        and the row-addressed URL list (Part 2), so the sheet is parsed
+        exactly once per job."""
+        bond_names: Set[str] = set()
+        urls: Set[str] = set()
+        url_data: List[Dict[str, any]] = []
+
         try:
-            logger.info("Fetching existing bond names and URLs from the sheet...")
-            
-            # Get all data from columns A and B
-            all_data = self.worksheet.get('A2:B', value_render_option='FORMULA')
-            
-            bond_names = set()
-            urls = set()
-            skipped_count = 0
-            
-            for index, row in enumerate(all_data):
-                row_num = index + 2
-                
-                # Skip completely empty rows
-                if not row or len(row) == 0:
-                    skipped_count += 1
-                    continue
-                
-                # Get name from column A
-                if len(row) > 0 and row[0]:
-                    name = str(row[0]).strip()
-                    if name:
-                        bond_names.add(name.lower())  # Store lowercase for case-insensitive comparison
-                
-                # Get URL from column B
-                if len(row) > 1 and row[1]:
-                    cell_content = row[1]
-                    
-                    if '=HYPERLINK' in str(cell_content).upper():
-                        match = re.search(r'=HYPERLINK\("([^"]+)"', cell_content, re.IGNORECASE)
-                        if match:
-                            urls.add(match.group(1))
-                    elif str(cell_content).startswith('http'):
-                        urls.add(cell_content)
-            
-            logger.info(f"Found {len(bond_names)} existing unique bond names and {len(urls)} existing unique URLs (skipped {skipped_count} empty rows).")
-            
-            return bond_names, urls
+            for row_num, name, url in self._parse_snapshot(snapshot):
+                if name:
+                    bond_names.add(name.lower())
+                display_name = name or f"Bond {row_num}"
+
+                if url:
+                    urls.add(url)
+                    url_data.append({'row': row_num, 'url': url, 'name': display_name})
+                    logger.debug(f"Row {row_num}: {display_name} -> {url}")
+                elif name:
+                    logger.warning(f"Row {row_num} has name '{display_name}' but no URL in column B")
+
+            logger.info(f"Found {len(bond_names)} existing unique bond names and {len(urls)} existing "
+                        f"unique URLs; {len(url_data)} URLs for detailed scraping.")
+
+            return bond_names, urls, url_data
         except Exception as e:
-            logger.error(f"Error fetching bond data from sheet: {e}")
-            return set(), set()
+            logger.error(f"Error parsing sheet snapshot: {e}")
+            return set(), set(), []
 
     def scrape_homepage_for_new_bonds(self, existing_names: Set[str], existing_urls: Set[str]) -> List[Dict[str, str]]:
         """
@@ -136,42 +364,45 @@ class StablebondsScraper:
             wait = WebDriverWait(self.driver, 20)
             wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.scrollbar-none a[data-anchor='true'] h4")))
             
-            # Now that the page is loaded, parse it with BeautifulSoup
-            soup = BeautifulSoup(self.driver.page_source, 'lxml')
-            
-            bond_links = soup.select("div.scrollbar-none a[data-anchor='true']")
+            # Pull every link's href/name out of the live DOM in one
+            # execute_script round-trip — no page_source serialization, no
+            # second parse of a page Chromium has already built, and no
+            # per-element WebDriver call.
+            bond_links = self.driver.execute_script(
+                "return Array.from(document.querySelectorAll("
+                "\"div.scrollbar-none a[data-anchor='true']\")).map(function(a) {"
+                "  var h4 = a.querySelector('h4');"
+                "  return {href: a.getAttribute('href'), name: h4 ? h4.textContent : ''};"
+                "});"
+            ) or []
             logger.info(f"Found {len(bond_links)} bond links on the homepage.")
 
+            # Frozen copies for the hot membership checks; additions from this
+            # scrape go into separate seen-sets so callers' sets stay untouched.
+            known_urls = frozenset(existing_urls)
+            known_names = frozenset(existing_names)
+            seen_urls: Set[str] = set()
+            seen_names: Set[str] = set()
+
             for link in bond_links:
                 href = link.get('href')
                 if not href or '/bonds/' not in href:
                     continue
 
-                # Find the <h4> tag inside the link to get the display name
-                name_tag = link.find('h4')
-                name = name_tag.get_text(strip=True) if name_tag else "Unknown Bond"
-                
-                # Check both URL and name for duplicates
-                is_duplicate_url = href in existing_urls
-                is_duplicate_name = name.lower() in existing_names
-                
-                if is_duplicate_url and is_duplicate_name:
-                    logger.debug(f"Skipping duplicate bond: {name} (both name and URL exist)")
-                    continue
-                elif is_duplicate_url:
-                    logger.warning(f"URL exists but name differs: '{name}' - URL: {href}")
-                    # Still skip if URL exists, even if name is different
-                    continue
-                elif is_duplicate_name:
-                    logger.warning(f"Name exists but URL differs: '{name}' - New URL: {href}")
-                    # Skip if name exists to prevent duplicates in Column A
+                # The <h4> inside the link holds the display name
+                name = (link.get('name') or "").strip() or "Unknown Bond"
+                name_lower = name.lower()
+
+                # A match on either key means the bond is already in the sheet
+                # (or already collected this scrape) — skip it either way.
+                if (href in known_urls or name_lower in known_names
+                        or href in seen_urls or name_lower in seen_names):
                     continue
-                else:
-                    # This is a genuinely new bond
-                    new_bonds.append({'name': name, 'url': href})
-                    existing_urls.add(href)
-                    existing_names.add(name.lower())
-                    logger.info(f"Found new bond: {name}")
+
+                new_bonds.append({'name': name, 'url': href})
+                seen_urls.add(href)
+                seen_names.add(name_lower)
+                logger.info(f"Found new bond: {name}")
             
             return new_bonds
         except TimeoutException:
@@ -181,175 +412,317 @@ class StablebondsScraper:
             logger.error(f"An error occurred during homepage scraping: {e}")
             return []
     
-    def get_last_data_row(self) -> int:
+    def get_last_data_row(self, snapshot: List[List[str]]) -> int:
         """Get the last row that contains data in column A or B"""
         try:
-            col_a_values = self.worksheet.col_values(1)  # Column A
-            col_b_values = self.worksheet.col_values(2)  # Column B
-            
-            # Find the last non-empty row in either column A or B
-            last_row = max(len(col_a_values), len(col_b_values))
-            
-            # Clean up: find actual last row with meaningful data
-            while last_row > 1:  # Don't go above header
-                if (last_row <= len(col_a_values) and col_a_values[last_row - 1].strip()) or \
-                   (last_row <= len(col_b_values) and col_b_values[last_row - 1].strip()):
-                    break
-                last_row -= 1
-            
+            last_row = 1
+            for row_num, row in enumerate(snapshot, 1):
+                # str() cast: FORMULA rendering still returns plain numeric
+                # cells as int/float, not str.
+                if row and ((row[0] and str(row[0]).strip()) or
+                            (len(row) > 1 and row[1] and str(row[1]).strip())):
+                    last_row = row_num
+
             logger.info(f"Last data row found at: {last_row}")
             return last_row
         except Exception as e:
             logger.error(f"Error finding last data row: {e}")
             return 1  # Return header row if error
-            
-    def get_urls_from_sheet(self) -> List[Dict[str, any]]:
-        """Gets all URLs from the sheet for scraping, including row numbers."""
+
+    def _throttle(self, url: str):
+        """Per-host token bucket: each caller reserves the next start slot under
+        the lock, then sleeps outside it, so parallel workers stay PER_HOST_DELAY
+        apart on the same host without serializing on the sleep itself."""
+        host = urlparse(url).netloc
+        with self._throttle_lock:
+            now = time.monotonic()
+            slot = max(self._next_ok.get(host, now), now)
+            self._next_ok[host] = slot + PER_HOST_DELAY
+        wait = slot - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _defer_host(self, url: str, retry_after: Optional[str], default_delay: float = 30.0):
+        """Push a host's next throttle slot out after a 429, honoring a numeric
+        Retry-After header when the server sends one."""
         try:
-            logger.info("Fetching all URLs from sheet for detailed scraping...")
-            
-            # Get all data from columns A and B at once
-            all_data = self.worksheet.get('A2:B', value_render_option='FORMULA')
-            
-            url_data = []
-            for index, row in enumerate(all_data):
-                row_num = index + 2
-                
-                # Skip completely empty rows
-                if not row or len(row) == 0:
-                    continue
-                
-                # Get name from column A
-                display_name = row[0] if len(row) > 0 and row[0] else f"Bond {row_num}"
-                
-                # Get URL from column B
-                if len(row) > 1 and row[1]:
-                    cell_content = row[1]
-                    url = None
-                    
-                    if '=HYPERLINK' in str(cell_content).upper():
-                        match = re.search(r'=HYPERLINK\("([^"]+)"', cell_content, re.IGNORECASE)
-                        if match: 
-                            url = match.group(1)
-                    elif str(cell_content).startswith('http'):
-                        url = cell_content
-                    
-                    if url:
-                        url_data.append({'row': row_num, 'url': url, 'name': display_name})
-                        logger.debug(f"Row {row_num}: {display_name} -> {url}")
-                else:
-                    logger.warning(f"Row {row_num} has name '{display_name}' but no URL in column B")
-            
-            logger.info(f"Retrieved {len(url_data)} URLs for detailed scraping.")
-            
-            # Additional check: Get total non-empty rows in column B
-            all_col_b = self.worksheet.col_values(2)
-            non_empty_b = [cell for cell in all_col_b[1:] if cell and cell.strip()]
-            logger.info(f"Total non-empty cells in column B: {len(non_empty_b)}")
-            
-            if len(url_data) < len(non_empty_b):
-                logger.warning(f"Mismatch detected! Found {len(url_data)} parseable URLs but {len(non_empty_b)} non-empty cells in column B")
-            
-            return url_data
+            delay = float(retry_after) if retry_after else default_delay
+        except ValueError:
+            delay = default_delay
+        host = urlparse(url).netloc
+        with self._throttle_lock:
+            self._next_ok[host] = max(self._next_ok.get(host, 0.0),
+                                      time.monotonic() + delay)
+        logger.warning(f"Rate limited by {host}; deferring further requests for {delay:.0f}s.")
+
+    def _load_fail_cache(self) -> Dict[str, float]:
+        """Load the persisted failure cache, dropping entries past their TTL."""
+        try:
+            with open(FAIL_CACHE_PATH) as f:
+                cached = json.load(f)
+            cutoff = time.time() - FAIL_CACHE_TTL
+            fresh = {url: ts for url, ts in cached.items()
+                     if isinstance(ts, (int, float)) and ts > cutoff}
+            if fresh:
+                logger.info(f"Loaded {len(fresh)} recently failed URLs to skip.")
+            return fresh
+        except FileNotFoundError:
+            return {}
         except Exception as e:
-            logger.error(f"Error getting URLs from sheet: {e}")
-            return []
-            
-    def scrape_max_value(self, url: str) -> Optional[int]:
-        """Scrape the max value from the specified input element using Selenium."""
+            logger.warning(f"Could not load failure cache: {e}")
+            return {}
+
+    def _save_fail_cache(self):
+        """Persist the failure cache for the next run; best-effort."""
         try:
-            self.driver.get(url)
-            time.sleep(4)
-            
-            selectors = [
-                "input.unit-selector-input[type='number']",
-                "//aside//input[@type='number']",
-                "//input[@type='number' and @inputmode='numeric']"
-            ]
-            
-            target_element = None
-            for selector in selectors:
-                try:
-                    if selector.startswith("//"):
-                        element = WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.XPATH, selector)))
-                    else:
-                        element = WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-                    target_element = element
-                    break
-                except TimeoutException:
-                    continue
-            
-            if target_element:
-                max_value = target_element.get_attribute('max')
-                return int(max_value) if max_value else None
+            with self._fail_cache_lock:
+                snapshot = dict(self._fail_cache)
+            with open(FAIL_CACHE_PATH, 'w') as f:
+                json.dump(snapshot, f)
+        except Exception as e:
+            logger.warning(f"Could not save failure cache: {e}")
+
+    def _fast_max_value(self, url: str):
+        """Try to read the max attribute straight from the server-rendered HTML.
+
+        A plain GET costs ~100ms against a multi-second Chromium render, so
+        attempt it first. Returns the int on a hit, None on any miss (the
+        caller falls back to the Selenium path), or _RATE_LIMITED after a 429
+        (the caller should not fall back).
+        """
+        try:
+            self._throttle(url)
+            with self.http.get(url, timeout=10, stream=True) as response:
+                if response.status_code == 429:
+                    # The adapter doesn't retry 429s (see __init__), so the
+                    # response lands here: back the whole host off so other
+                    # workers don't pile on.
+                    self._defer_host(url, response.headers.get('Retry-After'))
+                    return _RATE_LIMITED
+                if response.status_code != 200:
+                    return None
+                # Stream the body and stop as soon as the input shows up —
+                # the element sits early in the HTML, so most of a large page
+                # never needs to be downloaded.
+                buffer = b""
+                for chunk in response.iter_content(chunk_size=16384):
+                    buffer += chunk
+                    for pattern in _FAST_MAX_PATTERNS:
+                        match = pattern.search(buffer)
+                        if match:
+                            return int(match.group(1))
+                    if len(buffer) > 2 * 1024 * 1024:
+                        # Not in the first 2MB; give up rather than scan an
+                        # ever-growing buffer for every chunk.
+                        break
+            return None
+        except requests.RequestException:
             return None
+
+    def _scrape_one(self, url_info: Dict[str, any]) -> tuple[int, Optional[int]]:
+        """Scrape one bond's max value; returns (row, value).
+
+        Tries the HTTP fast path first and only borrows a pooled driver when
+        the attribute isn't in the static HTML. Results are memoized per run
+        so sheets with duplicate URLs pay for each fetch once."""
+        url = url_info['url']
+        with self._max_cache_lock:
+            if url in self._max_cache:
+                logger.debug(f"Row {url_info['row']}: reusing cached value for {url}")
+                return url_info['row'], self._max_cache[url]
+        with self._fail_cache_lock:
+            failed_at = self._fail_cache.get(url)
+        if failed_at is not None and time.time() - failed_at < FAIL_CACHE_TTL:
+            logger.info(f"Skipping Row {url_info['row']}: {url} failed recently.")
+            return url_info['row'], None
+        logger.info(f"Scraping details for Row {url_info['row']}: {url_info['name']}")
+        max_value = self._fast_max_value(url)
+        if max_value is _RATE_LIMITED:
+            # Launching Selenium against the host that just rate-limited us
+            # would make things worse; leave the cell blank this run and
+            # don't record a failure — the limit is transient.
+            return url_info['row'], None
+        if max_value is None:
+            driver = _acquire_driver(self.headless)
+            try:
+                max_value = self.scrape_max_value(url, driver)
+            finally:
+                _release_driver(driver)
+        with self._max_cache_lock:
+            self._max_cache[url] = max_value
+        with self._fail_cache_lock:
+            if max_value is None:
+                self._fail_cache[url] = time.time()
+            else:
+                self._fail_cache.pop(url, None)
+        return url_info['row'], max_value
+
+    def scrape_max_value(self, url: str, driver=None) -> Optional[int]:
+        """Scrape the max value from the specified input element using Selenium."""
+        driver = driver or self.driver
+        try:
+            self._throttle(url)
+            driver.get(url)
+
+            # One async script both waits for the input and reads its max
+            # attribute in-browser: a single CDP round-trip replaces the
+            # WebDriverWait polling (one round-trip per poll) plus the
+            # separate attribute read.
+            max_value = driver.execute_async_script(
+                """
+                var cb = arguments[arguments.length - 1];
+                var sel = arguments[0];
+                var t0 = performance.now();
+                (function poll() {
+                    var el = document.querySelector(sel);
+                    if (el && el.getAttribute('max')) return cb(el.getAttribute('max'));
+                    if (performance.now() - t0 > 8000) return cb(null);
+                    setTimeout(poll, 100);
+                })();
+                """,
+                _MAX_INPUT_CSS,
+            )
+            return int(max_value) if max_value else None
         except Exception:
             return None
     
-    def run_scraping_job(self):
-        """Main method to run the complete scraping and updating job."""
+    def run_scraping_job(self, only_new: bool = False):
+        """Main method to run the complete scraping and updating job.
+
+        With ``only_new`` set, rows that already have a value in the most
+        recent data column are copied forward instead of re-scraped — handy
+        for re-runs and debugging where only newly added bonds matter."""
         logger.info("Starting scraping job...")
-        
+        self._max_cache.clear()
+
         try:
+            # One full-sheet read up front; dedup sets, URL list, last-row
+            # detection and the header all come out of this local snapshot.
+            snapshot = self.fetch_snapshot()
+
             # === PART 1: DISCOVER AND ADD NEW BONDS ===
-            existing_names, existing_urls = self.get_existing_bonds()
+            existing_names, existing_urls, url_infos = self.scan_snapshot(snapshot)
             new_bonds = self.scrape_homepage_for_new_bonds(existing_names, existing_urls)
+            new_bonds_end_row = 0
+
+            # Structural writes (new-bond rows, new column header) accumulate
+            # here and go out as one values batchUpdate before scraping starts.
+            structural_updates = []
 
             if new_bonds:
                 logger.info(f"Found {len(new_bonds)} new bonds to add to the sheet.")
-                
+
                 # Find the next available row after existing data
-                last_row = self.get_last_data_row()
+                last_row = self.get_last_data_row(snapshot)
                 next_row = last_row + 1
-                
+
                 logger.info(f"Adding new bonds starting from row {next_row}")
-                
-                # Add each new bond individually to ensure proper placement
-                for i, bond in enumerate(new_bonds):
-                    row_to_write = next_row + i
-                    
-                    # Write to column A (Name)
-                    self.worksheet.update_cell(row_to_write, 1, bond['name'])
-                    
-                    # Write to column B (URL as hyperlink)
-                    hyperlink_formula = f'=HYPERLINK("{bond["url"]}", "{bond["name"]}")'
-                    self.worksheet.update_cell(row_to_write, 2, hyperlink_formula)
-                    
-                    logger.info(f"Added '{bond['name']}' at row {row_to_write}")
-                    time.sleep(0.5)  # Small delay to avoid rate limiting
-                
-                logger.info("Successfully added new bonds to columns A and B.")
+
+                # One range of name/url pairs instead of two update_cell calls
+                # (plus a rate-limit sleep) per bond. Plain URL strings under
+                # USER_ENTERED auto-link without the per-cell HYPERLINK formula
+                # Sheets would re-evaluate on every open.
+                new_bond_rows = [[bond['name'], bond['url']] for bond in new_bonds]
+                new_bonds_end_row = next_row + len(new_bond_rows) - 1
+                structural_updates.append({
+                    'range': f'A{next_row}:B{new_bonds_end_row}',
+                    'values': new_bond_rows,
+                })
+
+                # The snapshot predates these rows; register them locally so
+                # Part 2 picks up the new bonds without re-reading the sheet.
+                url_infos.extend(
+                    {'row': next_row + i, 'url': bond['url'], 'name': bond['name']}
+                    for i, bond in enumerate(new_bonds)
+                )
             else:
                 logger.info("No new bonds found on the homepage.")
 
-            # Small delay before fetching updated data
-            time.sleep(2)
-
             # === PART 2: SCRAPE MAX VALUES FOR ALL BONDS (EXISTING + NEW) ===
-            url_infos = self.get_urls_from_sheet()
             if not url_infos:
                 logger.warning("No URLs found in the sheet to scrape for details.")
                 return
 
-            header_row = self.worksheet.row_values(1)
-            next_data_col_index = len([h for h in header_row if h and h.strip()]) + 1
+            header_row = list(snapshot[0]) if snapshot else []
+            # str() cast as in _parse_snapshot: numeric header cells come back
+            # from the FORMULA-rendered snapshot as int/float.
+            next_data_col_index = sum(1 for h in header_row if h and str(h).strip()) + 1
+            data_col_letter = _col_letter(next_data_col_index)
 
-            ist_tz = ZoneInfo("Asia/Kolkata")
-            timestamp_str = datetime.now(ist_tz).strftime("%Y-%m-%d %H:%M")
+            timestamp_str = datetime.now(_IST_TZ).strftime("%Y-%m-%d %H:%M")
             header_title = f"Data ({timestamp_str})"
-            self.worksheet.update_cell(1, next_data_col_index, header_title)
-            
-            for i, url_info in enumerate(url_infos, 1):
-                url, row_num = url_info['url'], url_info['row']
-                logger.info(f"Processing {i}/{len(url_infos)}: Scraping details for Row {row_num}")
-                max_value = self.scrape_max_value(url)
-                value_to_write = max_value if max_value is not None else ""
-                self.worksheet.update_cell(row_num, next_data_col_index, value_to_write)
-                time.sleep(1) 
-            
+
+            # One batched call covers the appended bonds and the new column
+            # header together.
+            structural_updates.append({
+                'range': f'{data_col_letter}1',
+                'values': [[header_title]],
+            })
+            self._sheets_call(self.worksheet.batch_update, structural_updates,
+                              value_input_option='USER_ENTERED')
+            if new_bonds:
+                # Single format call so the new cells render like the old
+                # formula links.
+                self._sheets_call(format_cell_range, self.worksheet,
+                                  f'B{next_row}:B{new_bonds_end_row}',
+                                  CellFormat(textFormat=TextFormat(underline=True,
+                                                                   foregroundColor=Color(0.06, 0.45, 0.87))))
+                logger.info(f"Added {len(new_bonds)} new bonds to rows {next_row}-{new_bonds_end_row}.")
+
+            # Accumulate scraped values locally and write the whole column
+            # (rows 2..N; the header already went out above) in one API call
+            # instead of one write per cell.
+            last_scrape_row = max(info['row'] for info in url_infos)
+            column_values = [[""] for _ in range(last_scrape_row - 1)]
+
+            # In only-new mode, rows already populated in the previous data
+            # column keep their value (out of the snapshot, no API call) and
+            # only the remainder — typically just-added bonds — get scraped.
+            to_scrape = url_infos
+            if only_new:
+                # Locate the previous scrape column by its "Data (" header,
+                # the same way Part 3 does — the column immediately left of
+                # the new one is an "Hourly Change" diff column after any
+                # analysed run, and column C before the first run.
+                prev_data_cols = [i for i, h in enumerate(header_row, 1)
+                                  if isinstance(h, str) and h.startswith("Data (")]
+                if not prev_data_cols:
+                    logger.info("--only-new: no previous data column; scraping all rows.")
+                else:
+                    prev_idx = prev_data_cols[-1] - 1  # 0-based
+                    to_scrape = []
+                    for info in url_infos:
+                        row = snapshot[info['row'] - 1] if info['row'] <= len(snapshot) else []
+                        prev_val = row[prev_idx] if len(row) > prev_idx else ""
+                        # Carry plain values only — a formula string from the
+                        # FORMULA-rendered snapshot would go live again under
+                        # USER_ENTERED.
+                        if prev_val != "" and not (isinstance(prev_val, str) and prev_val.startswith('=')):
+                            column_values[info['row'] - 2] = [prev_val]
+                        else:
+                            to_scrape.append(info)
+                    logger.info(f"--only-new: carrying forward {len(url_infos) - len(to_scrape)} rows, "
+                                f"scraping {len(to_scrape)}.")
+
+            logger.info(f"Scraping {len(to_scrape)} bond pages with {SCRAPE_WORKERS} workers...")
+            with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+                for row_num, max_value in executor.map(self._scrape_one, to_scrape):
+                    column_values[row_num - 2] = [max_value if max_value is not None else ""]
+
+            self._sheets_call(self.worksheet.update, column_values,
+                              f'{data_col_letter}2:{data_col_letter}{last_scrape_row}',
+                              value_input_option='USER_ENTERED')
+            logger.info(f"Wrote {len(url_infos)} scraped values under '{header_title}' in one update.")
+
+            # Keep the locally cached header row in sync with the write above
+            # instead of re-fetching row 1 from the API.
+            if len(header_row) < next_data_col_index:
+                header_row.extend([""] * (next_data_col_index - len(header_row)))
+            header_row[next_data_col_index - 1] = header_title
+
             # === PART 3: AUTOMATED ANALYSIS ===
-            updated_header_row = self.worksheet.row_values(1)
-            data_columns = [i for i, h in enumerate(updated_header_row, 1) if h and h.startswith("Data (")]
+            data_columns = [i for i, h in enumerate(header_row, 1)
+                            if isinstance(h, str) and h.startswith("Data (")]
             
             logger.info(f"Found {len(data_columns)} data columns: {data_columns}")
             
@@ -360,61 +733,68 @@ class StablebondsScraper:
                 
                 logger.info(f"Comparing column {prev_data_col} with column {curr_data_col}")
                 
-                all_headers = self.worksheet.row_values(1)
-                diff_col_index = len([h for h in all_headers if h.strip()]) + 1
-                diff_col_letter = rowcol_to_a1(1, diff_col_index)[:-1]
-
-                prev_values_str = self.worksheet.col_values(prev_data_col, value_render_option='UNFORMATTED_VALUE')[1:]
-                curr_values_str = self.worksheet.col_values(curr_data_col, value_render_option='UNFORMATTED_VALUE')[1:]
-                face_values_str = self.worksheet.col_values(3, value_render_option='UNFORMATTED_VALUE')[1:] # Using Column C for Face Value
-
-                diff_values = []
-                for prev, curr, face_val in zip(prev_values_str, curr_values_str, face_values_str):
-                    try:
-                        prev_num = float(prev or 0)
-                        curr_num = float(curr or 0)
-                        face_num = float(face_val or 0)
-                        
-                        price_diff = prev_num - curr_num
-                        total_diff = price_diff * face_num
-                        
-                        diff_values.append([total_diff])
-                    except (ValueError, TypeError):
-                        diff_values.append([""])
+                diff_col_index = sum(1 for h in header_row if h and str(h).strip()) + 1
+                diff_col_letter = _col_letter(diff_col_index)
+                prev_letter = _col_letter(prev_data_col)
+                curr_letter = _col_letter(curr_data_col)
 
-                diff_header = f"Hourly Change ({timestamp_str})"
-                self.worksheet.update_cell(1, diff_col_index, diff_header)
-                if diff_values:
-                    self.worksheet.update(diff_values, f'{diff_col_letter}2')
-                logger.info(f"Added '{diff_header}' column at index {diff_col_index}.")
-                
-                # Add SUM formula at the bottom
-                all_values_in_col_a = self.worksheet.col_values(1)  # Get all values from column A
-                data_end_row = len(all_values_in_col_a)  # Last row with any data
+                # Last row with a bond name, from the snapshot plus anything
+                # appended this run
+                data_end_row = max(
+                    (i for i, row in enumerate(snapshot, 1) if row and row[0]),
+                    default=1
+                )
+                data_end_row = max(data_end_row, new_bonds_end_row)
                 total_row_index = data_end_row + 2  # Skip one row, then add TOTAL
-                
+
+                # Let Sheets compute (prev - curr) * face value server-side with a
+                # single ARRAYFORMULA instead of reading both data columns plus
+                # column C and writing the diff back row by row.
+                diff_formula = (
+                    f'=ARRAYFORMULA(IF({curr_letter}2:{curr_letter}{data_end_row}="","",'
+                    f'({prev_letter}2:{prev_letter}{data_end_row}-{curr_letter}2:{curr_letter}{data_end_row})'
+                    f'*C2:C{data_end_row}))'
+                )
+
+                diff_header = f"Hourly Change ({timestamp_str})"
                 sum_formula = f"=SUM({diff_col_letter}2:{diff_col_letter}{data_end_row})"
-                self.worksheet.update_cell(total_row_index, diff_col_index, sum_formula)
-                self.worksheet.update_cell(total_row_index, diff_col_index-1, "TOTAL:")
-                logger.info(f"Added SUM formula to cell {diff_col_letter}{total_row_index}.")
+
+                # Header, ARRAYFORMULA, TOTAL label and SUM in one batched write
+                # instead of four separate update_cell round-trips.
+                self._sheets_call(self.worksheet.batch_update, [
+                    {'range': f'{diff_col_letter}1', 'values': [[diff_header]]},
+                    {'range': f'{diff_col_letter}2', 'values': [[diff_formula]]},
+                    {'range': rowcol_to_a1(total_row_index, diff_col_index - 1), 'values': [["TOTAL:"]]},
+                    {'range': f'{diff_col_letter}{total_row_index}', 'values': [[sum_formula]]},
+                ], value_input_option='USER_ENTERED')
+                logger.info(f"Added '{diff_header}' column at index {diff_col_index} "
+                            f"and SUM formula at {diff_col_letter}{total_row_index} in one batch.")
             else:
                 logger.info("Need at least 2 data columns to calculate hourly changes.")
 
             logger.info("Scraping job completed successfully.")
             
         finally:
-            if self.driver:
-                self.driver.quit()
-                logger.info("Browser closed.")
+            self._save_fail_cache()
+            if self._driver:
+                _release_driver(self._driver)
+                self._driver = None
+                logger.info("Browser returned to pool.")
 
 def main():
     """Main function to run the scraper"""
     CREDENTIALS_PATH = 'service_account.json'
     SPREADSHEET_URL = 'https://docs.google.com/spreadsheets/d/1dIFvqToTTF0G9qyRy6dSdAtVOU763K0N3iOLkp0iWJY/edit?gid=0#gid=0'
-    
+
+    parser = argparse.ArgumentParser(description="Stablebonds sheet scraper")
+    parser.add_argument('--only-new', action='store_true',
+                        help="reuse the previous data column for rows that already "
+                             "have a value and scrape only unpopulated rows")
+    args = parser.parse_args()
+
     try:
         scraper = StablebondsScraper(CREDENTIALS_PATH, SPREADSHEET_URL, headless=True)
-        scraper.run_scraping_job()
+        scraper.run_scraping_job(only_new=args.only_new)
         
     except FileNotFoundError:
         logger.error(f"Credentials file not found at '{CREDENTIALS_PATH}'.")